@@ -1,8 +1,25 @@
 import os
-import uuid
-import json
+import mmap
+import time
+import heapq
+import asyncio
+import functools
 import logging
-from typing import Dict, List, Any
+import secrets
+import sqlite3
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+    import json
+try:
+    import zstandard as zstd
+except ImportError:  # pragma: no cover
+    zstd = None
+from typing import Dict, List, Tuple, Any, Union, FrozenSet
+from dataclasses import dataclass
+from cachetools import LRUCache
 from telegram import Update
 from telegram.ext import (
     Application, CommandHandler, MessageHandler, ContextTypes, filters
@@ -10,10 +27,12 @@ from telegram.ext import (
 
 # Load from environment variables
 BOT_TOKEN = os.getenv("BOT_TOKEN")
-ADMIN_ID = int(os.getenv("ADMIN_ID", 0))
+ADMIN_IDS = frozenset(int(x) for x in os.getenv("ADMIN_ID", "0").split(",") if x.strip())
 PRIVATE_CHANNEL_ID = int(os.getenv("PRIVATE_CHANNEL_ID", 0))
 BOT_USERNAME = os.getenv("BOT_USERNAME", "YourBotUsername")
-STORAGE_FILE = "storage.json"
+_LINK_PREFIX = "https://t.me/" + BOT_USERNAME + "?start="
+STORAGE_FILE = "storage.json"  # legacy store, migrated into DB_FILE on startup
+DB_FILE = "storage.db"
 DEFAULT_DELETE_SECONDS = int(os.getenv("DELETE_TIMER", 600))
 
 # Logger setup
@@ -23,38 +42,221 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-# In-memory storage
-video_storage: Dict[str, List[int]] = {}
-delete_timer: Dict[str, int] = {"timer": DEFAULT_DELETE_SECONDS}
-batch_sessions: Dict[int, List[Any]] = {}
+@dataclass(frozen=True, slots=True)
+class Config:
+    """Hot configuration, bound once to bot_data so handlers resolve it
+    with fast attribute access instead of module-global lookups."""
+    admin_ids: FrozenSet[int]
+    channel_id: int
+    bot_username: str
+    link_prefix: str
 
-# Storage helpers
-def load_storage() -> None:
-    if os.path.exists(STORAGE_FILE):
-        with open(STORAGE_FILE, "r") as f:
-            data = json.load(f)
-            video_storage.update(data.get("storage", {}))
-            delete_timer.update(data.get("timer", {"timer": DEFAULT_DELETE_SECONDS}))
+# In-memory state
+delete_timer: Dict[str, int] = {"timer": DEFAULT_DELETE_SECONDS}
+# Pending batches keep only (chat_id, message_id) pairs, not Message objects
+batch_sessions: Dict[int, List[Tuple[int, int]]] = {}
+
+# Persistence: SQLite in WAL mode. Tokens live on disk instead of in a
+# JSON-serialized dict, so a mutation costs one indexed write instead of
+# a full-store rewrite, lookups do not require the whole store in RAM,
+# and crash safety comes from the journal rather than tmp+rename dances.
+def _loads(raw: bytes) -> Any:
+    return orjson.loads(raw) if orjson else json.loads(raw)
+
+def _dumps(obj: Any) -> bytes:
+    return orjson.dumps(obj) if orjson else json.dumps(obj).encode()
+
+# A token maps to a bare message id in the common single-media case
+# (no list/tuple wrapper to store or hash) and a tuple for batches.
+StoredIds = Union[int, Tuple[int, ...], List[int]]
+
+_db: sqlite3.Connection = None
+
+def init_storage() -> None:
+    global _db
+    # check_same_thread=False because reads/writes run via asyncio.to_thread;
+    # sqlite3 serializes access to the connection internally.
+    _db = sqlite3.connect(DB_FILE, isolation_level=None, check_same_thread=False)
+    _db.execute("PRAGMA journal_mode=WAL")
+    _db.execute("PRAGMA synchronous=NORMAL")
+    _db.execute("CREATE TABLE IF NOT EXISTS tokens (token TEXT PRIMARY KEY, ids BLOB NOT NULL, expires_at REAL)")
+    try:
+        _db.execute("ALTER TABLE tokens ADD COLUMN expires_at REAL")
+    except sqlite3.OperationalError:
+        pass  # column already present
+    _db.execute("CREATE TABLE IF NOT EXISTS settings (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+    _migrate_json_storage()
+    row = _db.execute("SELECT value FROM settings WHERE key='timer'").fetchone()
+    if row:
+        delete_timer["timer"] = int(row[0])
+    # Rebuild the expiry heap so pending deletions survive restarts
+    rows = _db.execute("SELECT expires_at, token FROM tokens WHERE expires_at IS NOT NULL").fetchall()
+    _expiry_heap.extend((expires_at, token) for expires_at, token in rows)
+    heapq.heapify(_expiry_heap)
+
+def _migrate_json_storage() -> None:
+    # One-time import of the old storage.json (and its op log) into SQLite.
+    # Snapshots may also arrive zstd-compressed as storage.json.zst.
+    zst_file = STORAGE_FILE + ".zst"
+    if zstd and os.path.exists(zst_file) and os.path.getsize(zst_file) > 0:
+        legacy_file = zst_file
+        with open(zst_file, "rb") as f:
+            data = _loads(zstd.ZstdDecompressor().decompress(f.read()))
+    elif os.path.exists(STORAGE_FILE) and os.path.getsize(STORAGE_FILE) > 0:
+        legacy_file = STORAGE_FILE
+        # mmap the snapshot so parsing reads straight from the page cache
+        # instead of first copying the whole file into a Python bytes object.
+        with open(STORAGE_FILE, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            if orjson:
+                view = memoryview(mm)
+                try:
+                    data = orjson.loads(view)
+                finally:
+                    view.release()
+            else:
+                data = json.loads(mm[:])
+    else:
+        return
+    storage = data.get("storage", {})
+    log_file = STORAGE_FILE + ".log"
+    if os.path.exists(log_file):
+        with open(log_file, "rb") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    entry = _loads(line)
+                except Exception as e:
+                    logger.warning(f"Skipping corrupt log entry: {e}")
+                    continue
+                if entry.get("op") == "add":
+                    storage[entry["t"]] = entry["i"]
+                elif entry.get("op") == "del":
+                    storage.pop(entry["t"], None)
+                elif entry.get("op") == "timer":
+                    data.setdefault("timer", {})["timer"] = entry["s"]
+    # Import everything in one transaction: either the whole legacy
+    # store lands in SQLite or none of it does, and the snapshot is only
+    # retired (atomic os.replace) after the commit succeeds. A crash at
+    # any point leaves a state the next startup can redo cleanly.
+    _db.execute("BEGIN IMMEDIATE")
+    try:
+        for token, ids in storage.items():
+            _db.execute("INSERT OR REPLACE INTO tokens (token, ids) VALUES (?, ?)", (token, _dumps(ids)))
+        timer = data.get("timer", {}).get("timer")
+        if timer is not None:
+            _db.execute("INSERT OR REPLACE INTO settings (key, value) VALUES ('timer', ?)", (str(timer),))
+        _db.execute("COMMIT")
+    except Exception:
+        _db.execute("ROLLBACK")
+        raise
+    if zstd and legacy_file == STORAGE_FILE:
+        # Retire the snapshot as a zstd level-3 backup (the repeating ids
+        # and token charset compress 5-10x), via tmp+replace as usual.
+        backup_tmp = STORAGE_FILE + ".bak.zst.tmp"
+        with open(STORAGE_FILE, "rb") as f:
+            compressed = zstd.ZstdCompressor(level=3).compress(f.read())
+        with open(backup_tmp, "wb") as f:
+            f.write(compressed)
+        os.replace(backup_tmp, STORAGE_FILE + ".bak.zst")
+        os.remove(STORAGE_FILE)
+    else:
+        os.replace(legacy_file, legacy_file + ".bak")
+    if os.path.exists(log_file):
+        os.remove(log_file)
+    logger.info(f"Migrated {len(storage)} tokens from {legacy_file} to {DB_FILE}")
+
+def _db_get(token: str) -> StoredIds:
+    row = _db.execute("SELECT ids FROM tokens WHERE token=?", (token,)).fetchone()
+    return _loads(row[0]) if row else None
+
+def _db_put(token: str, ids: StoredIds, expires_at: float = None) -> None:
+    _db.execute(
+        "INSERT OR REPLACE INTO tokens (token, ids, expires_at) VALUES (?, ?, ?)",
+        (token, _dumps(ids), expires_at)
+    )
 
-def save_storage() -> None:
-    with open(STORAGE_FILE, "w") as f:
-        json.dump({"storage": video_storage, "timer": delete_timer}, f)
+def _db_delete(token: str) -> None:
+    _db.execute("DELETE FROM tokens WHERE token=?", (token,))
+
+def _db_set_timer(seconds: int) -> None:
+    _db.execute("INSERT OR REPLACE INTO settings (key, value) VALUES ('timer', ?)", (str(seconds),))
+
+# Hot tokens (links users click right after they are generated) resolve
+# from this LRU without touching the database.
+_token_cache: LRUCache = LRUCache(maxsize=10_000)
+
+# Async wrappers keeping the blocking sqlite calls off the event loop
+async def storage_get(token: str) -> StoredIds:
+    ids = _token_cache.get(token)
+    if ids is None:
+        ids = await asyncio.to_thread(_db_get, token)
+        if ids is not None:
+            _token_cache[token] = ids
+    return ids
+
+async def storage_put(token: str, ids: StoredIds, expires_at: float = None) -> None:
+    await asyncio.to_thread(_db_put, token, ids, expires_at)
+    _token_cache[token] = ids
+
+async def storage_delete(token: str) -> None:
+    _token_cache.pop(token, None)
+    await asyncio.to_thread(_db_delete, token)
+
+async def storage_set_timer(seconds: int) -> None:
+    await asyncio.to_thread(_db_set_timer, seconds)
+
+async def _close_storage(application: Application) -> None:
+    _db.close()
+
+# Telegram's copyMessages/deleteMessages accept at most 100 ids per call
+TELEGRAM_BATCH_LIMIT = 100
+
+def _chunked(ids: List[int], size: int = TELEGRAM_BATCH_LIMIT):
+    for i in range(0, len(ids), size):
+        yield ids[i:i + size]
+
+# Cap concurrent Bot API calls so parallel chunks stay within
+# Telegram's ~30 msg/s rate limit.
+_api_semaphore = asyncio.Semaphore(10)
+
+async def _bounded(coro):
+    async with _api_semaphore:
+        return await coro
+
+async def _gather_limited(coros: List[Any]) -> List[Any]:
+    return await asyncio.gather(*(_bounded(c) for c in coros))
+
+def admin_only(denial: str):
+    """Reject non-admin callers with `denial` before the handler runs."""
+    def decorator(handler):
+        @functools.wraps(handler)
+        async def wrapper(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+            if update.effective_user.id not in context.bot_data["cfg"].admin_ids:
+                await update.message.reply_text(denial)
+                return
+            return await handler(update, context)
+        return wrapper
+    return decorator
 
 # Command handlers
 async def start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    cfg = context.bot_data["cfg"]
     args = context.args
     chat_id = update.effective_chat.id
 
     if args:
         token = args[0]
-        message_ids = video_storage.get(token)
-        if message_ids:
+        stored = await storage_get(token)
+        if stored:
+            message_ids = (stored,) if isinstance(stored, int) else stored
             try:
-                for msg_id in message_ids:
-                    await context.bot.copy_message(
+                for chunk in _chunked(message_ids):
+                    await context.bot.copy_messages(
                         chat_id=chat_id,
-                        from_chat_id=PRIVATE_CHANNEL_ID,
-                        message_id=msg_id,
+                        from_chat_id=cfg.channel_id,
+                        message_ids=chunk,
                         protect_content=True
                     )
                 await update.message.reply_text("✅ Media delivered (Forwarding protected).")
@@ -65,17 +267,13 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
             await update.message.reply_text("❌ Invalid or expired link.")
     else:
         await update.message.reply_text(
-            f"👋 Welcome to @{BOT_USERNAME}!\n"
+            f"👋 Welcome to @{cfg.bot_username}!\n"
             f"🔒 Only admin can upload content.\n"
             f"⏱️ Auto-delete timer is set to {delete_timer['timer']} seconds."
         )
 
+@admin_only("⛔ Only admin can access this command.")
 async def help_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
-    user_id = update.effective_user.id
-    if user_id != ADMIN_ID:
-        await update.message.reply_text("⛔ Only admin can access this command.")
-        return
-
     help_text = (
         "📋 *Admin Commands:*\n"
         "/start <token> - Get stored media by token\n"
@@ -86,68 +284,63 @@ async def help_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> No
     )
     await update.message.reply_text(help_text, parse_mode="Markdown")
 
+@admin_only("⛔ Only the admin can set timer.")
 async def settimer(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
-    user_id = update.effective_user.id
-    if user_id != ADMIN_ID:
-        await update.message.reply_text("⛔ Only the admin can set timer.")
-        return
-
     if not context.args or not context.args[0].isdigit():
         await update.message.reply_text("Usage: /settimer <seconds>")
         return
 
     seconds = int(context.args[0])
     delete_timer["timer"] = seconds
-    save_storage()
+    await storage_set_timer(seconds)
     await update.message.reply_text(f"✅ Auto-delete timer updated to {seconds} seconds.")
 
 # Media handlers
+@admin_only("⛔ Only the admin can upload media.")
 async def handle_media(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    cfg = context.bot_data["cfg"]
     user = update.effective_user
     chat_id = update.effective_chat.id
 
-    if user.id != ADMIN_ID:
-        await update.message.reply_text("⛔ Only the admin can upload media.")
-        return
-
     # Batch mode
     if user.id in batch_sessions:
-        batch_sessions[user.id].append(update.message)
-        await update.message.reply_text("📥 Added to batch. Send /done to finish.")
+        session = batch_sessions[user.id]
+        session.append((chat_id, update.message.message_id))
+        if len(session) >= MAX_BATCH_ITEMS:
+            # Cap reached: flush this batch into its own link and keep
+            # collecting, so a runaway session cannot grow unbounded.
+            batch_sessions[user.id] = []
+            await _finalize_batch(update, context, session)
+        elif len(session) % 10 == 0:
+            # Acknowledge every 10th item instead of every one, keeping
+            # the 30 msg/s rate-limit budget for the uploads themselves.
+            await update.message.reply_text(
+                f"📥 {len(session)} items in batch. Send /done to finish."
+            )
         return
 
     try:
         forwarded = await context.bot.copy_message(
-            chat_id=PRIVATE_CHANNEL_ID,
+            chat_id=cfg.channel_id,
             from_chat_id=chat_id,
             message_id=update.message.message_id,
             protect_content=True
         )
 
-        token = str(uuid.uuid4())
-        video_storage[token] = [forwarded.message_id]
-        save_storage()
+        token = secrets.token_urlsafe(12)
+        expires_at = time.time() + delete_timer["timer"]
+        await storage_put(token, forwarded.message_id, expires_at)
+        _schedule_expiry(token, expires_at)
 
-        link = f"https://t.me/{BOT_USERNAME}?start={token}"
+        link = cfg.link_prefix + token
         await update.message.reply_text(f"✅ Media stored!\n🔗 Link: {link}")
-
-        # Schedule deletion
-        context.job_queue.run_once(
-            delete_from_channel,
-            when=delete_timer["timer"],
-            name=token,
-            data={"message_ids": [forwarded.message_id]}
-        )
     except Exception as e:
         logger.error(f"Media handling error: {e}")
         await update.message.reply_text("❌ Error while storing media.")
 
+@admin_only("⛔ Only admin can start batch upload.")
 async def batch_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     user = update.effective_user
-    if user.id != ADMIN_ID:
-        await update.message.reply_text("⛔ Only admin can start batch upload.")
-        return
-
     if user.id in batch_sessions:
         await update.message.reply_text("⚠️ You already started a batch.")
         return
@@ -155,61 +348,93 @@ async def batch_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> N
     batch_sessions[user.id] = []
     await update.message.reply_text("📦 Batch upload started. Send media now.")
 
-async def done_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
-    user = update.effective_user
-    if user.id != ADMIN_ID:
-        await update.message.reply_text("⛔ Only admin can finish batch.")
-        return
-
-    if user.id not in batch_sessions or not batch_sessions[user.id]:
-        await update.message.reply_text("⚠️ No active batch or no media sent.")
-        return
+# Sessions auto-flush into a link once they hit the copyMessages cap,
+# keeping pending-batch memory bounded.
+MAX_BATCH_ITEMS = TELEGRAM_BATCH_LIMIT
 
-    messages = batch_sessions.pop(user.id)
+async def _finalize_batch(update: Update, context: ContextTypes.DEFAULT_TYPE,
+                          messages: List[Tuple[int, int]]) -> None:
+    cfg = context.bot_data["cfg"]
     message_ids = []
 
     try:
-        for msg in messages:
-            forwarded = await context.bot.copy_message(
-                chat_id=PRIVATE_CHANNEL_ID,
-                from_chat_id=msg.chat_id,
-                message_id=msg.message_id,
+        # One copyMessages call per 100 items instead of one per item;
+        # group by source chat since the API takes a single from_chat_id.
+        by_chat: Dict[int, List[int]] = {}
+        for from_chat_id, message_id in messages:
+            by_chat.setdefault(from_chat_id, []).append(message_id)
+
+        # Fire the per-chat/per-chunk calls concurrently; gather keeps
+        # result order, so message_ids still matches submission order.
+        calls = [
+            context.bot.copy_messages(
+                chat_id=cfg.channel_id,
+                from_chat_id=from_chat_id,
+                message_ids=chunk,
                 protect_content=True
             )
-            message_ids.append(forwarded.message_id)
-
-        token = str(uuid.uuid4())
-        video_storage[token] = message_ids
-        save_storage()
-
-        link = f"https://t.me/{BOT_USERNAME}?start={token}"
-        await update.message.reply_text(f"✅ Batch stored!\n🔗 Link: {link}")
-
-        context.job_queue.run_once(
-            delete_from_channel,
-            when=delete_timer["timer"],
-            name=token,
-            data={"message_ids": message_ids}
+            for from_chat_id, ids in by_chat.items()
+            for chunk in _chunked(ids)
+        ]
+        for copied in await _gather_limited(calls):
+            message_ids.extend(m.message_id for m in copied)
+
+        token = secrets.token_urlsafe(12)
+        expires_at = time.time() + delete_timer["timer"]
+        await storage_put(token, tuple(message_ids), expires_at)
+        _schedule_expiry(token, expires_at)
+
+        link = cfg.link_prefix + token
+        await update.message.reply_text(
+            f"📦 {len(messages)} items batched.\n✅ Batch stored!\n🔗 Link: {link}"
         )
     except Exception as e:
         logger.error(f"Batch error: {e}")
         await update.message.reply_text("❌ Error during batch upload.")
 
-# Job to delete messages from channel and remove token
-async def delete_from_channel(context: ContextTypes.DEFAULT_TYPE) -> None:
-    data = context.job.data
-    token = context.job.name
-    message_ids = data.get("message_ids", [])
-
-    for msg_id in message_ids:
-        try:
-            await context.bot.delete_message(chat_id=PRIVATE_CHANNEL_ID, message_id=msg_id)
-        except Exception as e:
-            logger.warning(f"Delete error: {e}")
+@admin_only("⛔ Only admin can finish batch.")
+async def done_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    user = update.effective_user
+    if user.id not in batch_sessions or not batch_sessions[user.id]:
+        await update.message.reply_text("⚠️ No active batch or no media sent.")
+        return
 
-    if token in video_storage:
-        del video_storage[token]
-        save_storage()
+    await _finalize_batch(update, context, batch_sessions.pop(user.id))
+
+# Expiry: instead of one scheduled job per token, a single repeating
+# sweep pops due entries off a heap, so the scheduler holds one entry
+# no matter how many links are outstanding.
+SWEEP_INTERVAL = 30
+_expiry_heap: List[Tuple[float, str]] = []
+
+def _schedule_expiry(token: str, expires_at: float) -> None:
+    heapq.heappush(_expiry_heap, (expires_at, token))
+
+async def sweep_expired(context: ContextTypes.DEFAULT_TYPE) -> None:
+    cfg = context.bot_data["cfg"]
+    now = time.time()
+    message_ids: List[int] = []
+    while _expiry_heap and _expiry_heap[0][0] <= now:
+        _, token = heapq.heappop(_expiry_heap)
+        ids = await storage_get(token)
+        if isinstance(ids, int):
+            message_ids.append(ids)
+        elif ids:
+            message_ids.extend(ids)
+        await storage_delete(token)
+
+    if not message_ids:
+        return
+    results = await asyncio.gather(
+        *(
+            _bounded(context.bot.delete_messages(chat_id=cfg.channel_id, message_ids=chunk))
+            for chunk in _chunked(message_ids)
+        ),
+        return_exceptions=True
+    )
+    for result in results:
+        if isinstance(result, Exception):
+            logger.warning(f"Delete error: {result}")
 
 # Global error handler
 async def error_handler(update: object, context: ContextTypes.DEFAULT_TYPE) -> None:
@@ -217,9 +442,21 @@ async def error_handler(update: object, context: ContextTypes.DEFAULT_TYPE) -> N
 
 # Main function
 def main() -> None:
-    load_storage()
+    init_storage()
 
-    application = Application.builder().token(BOT_TOKEN).build()
+    application = (
+        Application.builder()
+        .token(BOT_TOKEN)
+        .post_shutdown(_close_storage)
+        .build()
+    )
+
+    application.bot_data["cfg"] = Config(
+        admin_ids=ADMIN_IDS,
+        channel_id=PRIVATE_CHANNEL_ID,
+        bot_username=BOT_USERNAME,
+        link_prefix=_LINK_PREFIX,
+    )
 
     # Register handlers
     application.add_handler(CommandHandler("start", start))
@@ -235,6 +472,8 @@ def main() -> None:
 
     application.add_error_handler(error_handler)
 
+    application.job_queue.run_repeating(sweep_expired, interval=SWEEP_INTERVAL)
+
     # Run the bot
     application.run_polling(allowed_updates=None)
 